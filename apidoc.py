@@ -1,6 +1,6 @@
 import os
 import re
-from typing import Callable, Iterable, List, Optional
+from typing import Callable, Iterable, List, Optional, Set
 
 from pyparsing import ParseException
 
@@ -32,12 +32,18 @@ __all__ = [
 ]
 
 
-def parse_luadocs(peek: Optional[str], file: LuaFile, lines: List[str]) -> None:
-    annotations = set([])
-    for line in lines:
-        m = ANNOTATION_RE.match(line)
-        if m:
-            annotations.add(m[1])
+def parse_luadocs(
+    peek: Optional[str],
+    file: LuaFile,
+    lines: List[str],
+    annotations: Optional[Set[str]] = None,
+) -> None:
+    if annotations is None:
+        annotations = set([])
+        for line in lines:
+            m = ANNOTATION_RE.match(line)
+            if m:
+                annotations.add(m[1])
 
     try:
         fn = peek and FN_RE.match(peek)
@@ -65,15 +71,23 @@ def parse_luadocs(peek: Optional[str], file: LuaFile, lines: List[str]) -> None:
 
 def _parse_lines(lines: Iterable[str]) -> "LuaFile":
     file = LuaFile()
-    chunk = []
+    # The chunk can't be reused between comment blocks because LuaFunc keeps it as
+    # raw_annotation, but we can collect the annotation tags while we build it.
+    chunk: List[str] = []
+    annotations: Set[str] = set()
     for line in lines:
         if line.startswith("---"):
             chunk.append(line)
+            if line.startswith("---@"):
+                m = ANNOTATION_RE.match(line)
+                if m:
+                    annotations.add(m[1])
         elif chunk:
-            parse_luadocs(line, file, chunk)
+            parse_luadocs(line, file, chunk, annotations)
             chunk = []
+            annotations = set()
     if chunk:
-        parse_luadocs(None, file, chunk)
+        parse_luadocs(None, file, chunk, annotations)
     return file
 
 
@@ -1,76 +1,118 @@
+import io
 import itertools
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from functools import lru_cache
-from typing import List
+from typing import FrozenSet, List, Tuple
 
 from .markdown import MD_LINK_PAT, MD_TITLE_PAT, create_md_anchor
 
+CODE_FENCE_RE = re.compile(r"^```", re.MULTILINE)
+HTTP_RE = re.compile(r"^<?http")
 
-@lru_cache
-def read(filename: str) -> str:
+
+@lru_cache(maxsize=None)
+def _read_real(filename: str) -> str:
     with open(filename, "r", encoding="utf-8") as ifile:
         return ifile.read()
 
 
-def validate_anchor(filename: str, anchor: str) -> bool:
-    text = read(filename)
-    for match in re.finditer(MD_TITLE_PAT, text):
+@lru_cache(maxsize=None)
+def _read_lines_real(filename: str) -> Tuple[str, ...]:
+    # Split on newlines only, the same as iterating over the file would
+    return tuple(io.StringIO(_read_real(filename)))
+
+
+def read(filename: str) -> str:
+    # Cache by real path so that different relative paths to a file share an entry
+    return _read_real(os.path.realpath(filename))
+
+
+def read_lines(filename: str) -> Tuple[str, ...]:
+    return _read_lines_real(os.path.realpath(filename))
+
+
+@lru_cache(maxsize=None)
+def _valid_anchors_real(filename: str) -> FrozenSet[str]:
+    anchors = set()
+    for match in MD_TITLE_PAT.finditer(_read_real(filename)):
         title = match[2]
         link_match = MD_LINK_PAT.match(title)
         if link_match:
             title = link_match[1]
-        if anchor == create_md_anchor(title):
-            return True
-    return False
+        anchors.add(create_md_anchor(title))
+    return frozenset(anchors)
 
 
-def lint_file(filename: str, root: str) -> List[str]:
-    errors = []
-    text = read(filename)
+def validate_anchor(filename: str, anchor: str) -> bool:
+    return anchor in _valid_anchors_real(os.path.realpath(filename))
 
-    inside_code_block = False
 
-    inside_code_block = False
-    with open(filename, "r", encoding="utf-8") as ifile:
-        for line in ifile:
-            if inside_code_block:
-                inside_code_block = not re.match(r"^```", line)
-                continue
-            elif re.match(r"^```", line):
-                inside_code_block = True
+def code_block_spans(text: str) -> List[Tuple[int, int]]:
+    """Find the [start, end) line ranges of the fenced code blocks in the text"""
+    fences = []
+    lnum = 0
+    pos = 0
+    for match in CODE_FENCE_RE.finditer(text):
+        lnum += text.count("\n", pos, match.start())
+        pos = match.start()
+        fences.append(lnum)
+    if len(fences) % 2 == 1:
+        # Unclosed code block runs to the end of the file
+        fences.append(text.count("\n", pos) + lnum)
+    return [(start, end + 1) for start, end in zip(fences[::2], fences[1::2])]
+
+
+def lint_file(filename: str, root: str) -> List[str]:
+    errors = []
+    blocks = code_block_spans(read(filename))
+    block = 0
+    for lnum, line in enumerate(read_lines(filename)):
+        while block < len(blocks) and lnum >= blocks[block][1]:
+            block += 1
+        if block < len(blocks) and lnum >= blocks[block][0]:
+            continue
+        # Most lines have no links, so skip the regex when it can't possibly match
+        if "](" not in line:
+            continue
+        for match in MD_LINK_PAT.finditer(line):
+            link = match[2]
+            if HTTP_RE.match(link):
                 continue
-            for match in re.finditer(MD_LINK_PAT, line):
-                link = match[2]
-                if re.match(r"^<?http", link):
-                    continue
-                pieces = link.split("#")
-                if len(pieces) == 1:
-                    linkfile, anchor = pieces[0], None
-                elif len(pieces) == 2:
-                    linkfile, anchor = pieces
-                else:
-                    raise ValueError(f"Invalid link {link}")
-                if linkfile:
-                    abs_linkfile = os.path.join(os.path.dirname(filename), linkfile)
-                else:
-                    abs_linkfile = filename
-
-                relfile = os.path.relpath(filename, root)
-                if not os.path.exists(abs_linkfile):
-                    errors.append(f"{relfile} invalid link: {link}")
-                elif anchor and not validate_anchor(abs_linkfile, anchor):
-                    errors.append(f"{relfile} invalid link anchor: {link}")
+            pieces = link.split("#")
+            if len(pieces) == 1:
+                linkfile, anchor = pieces[0], None
+            elif len(pieces) == 2:
+                linkfile, anchor = pieces
+            else:
+                raise ValueError(f"Invalid link {link}")
+            if linkfile:
+                abs_linkfile = os.path.normpath(
+                    os.path.join(os.path.dirname(filename), linkfile)
+                )
+            else:
+                abs_linkfile = filename
+
+            relfile = os.path.relpath(filename, root)
+            if not os.path.exists(abs_linkfile):
+                errors.append(f"{relfile} invalid link: {link}")
+            elif anchor and not validate_anchor(abs_linkfile, anchor):
+                errors.append(f"{relfile} invalid link anchor: {link}")
 
     return errors
 
 
 def main(root: str, files: List[str]) -> None:
     """Main method"""
-    errors = list(
-        itertools.chain.from_iterable([lint_file(file, root) for file in files])
-    )
+    # Not worth the cost of starting worker processes for only a few files
+    if len(files) < 4:
+        results = [lint_file(file, root) for file in files]
+    else:
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(lint_file, files, itertools.repeat(root)))
+    errors = list(itertools.chain.from_iterable(results))
     for error in errors:
         print(error)
     sys.exit(len(errors))
@@ -1,5 +1,6 @@
 import re
-from typing import Dict, Iterable, Iterator, List, Union
+from functools import lru_cache
+from typing import Dict, List, Union
 
 from .apidoc import LuaFunc, LuaParam, LuaTypes
 from .util import Command
@@ -9,6 +10,14 @@ MD_BOLD_PAT = re.compile(r"\*\*([^\*]+)\*\*")
 MD_LINK_PAT = re.compile(r"\[([^\]]+)\]\(([^\)]+)\)")
 MD_LINE_BREAK_PAT = re.compile(r"\s*\\$")
 VIMDOC_LINK_PAT = re.compile(r"\B\|([^|]+)\|\B")
+MD_ANCHOR_SPACE_PAT = re.compile(r"\s")
+MD_ANCHOR_STRIP_PAT = re.compile(r"[^\w\-]")
+# Does the same as the two anchor patterns, but only for ASCII characters
+MD_ANCHOR_TABLE = {
+    c: "-" if MD_ANCHOR_SPACE_PAT.match(chr(c)) else None
+    for c in range(128)
+    if MD_ANCHOR_SPACE_PAT.match(chr(c)) or MD_ANCHOR_STRIP_PAT.match(chr(c))
+}
 
 
 __all__ = [
@@ -23,36 +32,32 @@ __all__ = [
 ]
 
 
-def file_iter(filename: str) -> Iterator[str]:
-    with open(filename, "r", encoding="utf-8") as ifile:
-        yield from ifile
-
-
 def generate_md_toc(
     filename_or_lines: Union[str, List[str]], max_level: int = 99
 ) -> List[str]:
     ret = []
-    lines: Iterable[str] = []
     if isinstance(filename_or_lines, str):
-        lines = file_iter(filename_or_lines)
+        with open(filename_or_lines, "r", encoding="utf-8") as ifile:
+            text = ifile.read()
     else:
-        lines = filename_or_lines
-    for line in lines:
-        m = MD_TITLE_PAT.match(line)
-        if m:
-            level = len(m[1]) - 1
-            if level < max_level:
-                prefix = "  " * level
-                title_link = create_md_anchor(m[2])
-                link = f"[{m[2]}](#{title_link})"
-                ret.append(prefix + "- " + link + "\n")
+        text = "".join(filename_or_lines)
+    for m in MD_TITLE_PAT.finditer(text):
+        level = len(m[1]) - 1
+        if level < max_level:
+            prefix = "  " * level
+            title_link = create_md_anchor(m[2])
+            link = f"[{m[2]}](#{title_link})"
+            ret.append(prefix + "- " + link + "\n")
     return ret
 
 
+@lru_cache(maxsize=4096)
 def create_md_anchor(title: str) -> str:
-    title = re.sub(r"\s", "-", title.lower())
-    title = re.sub(r"[^\w\-]", "", title.lower())
-    return title
+    title = title.lower()
+    if title.isascii():
+        return title.translate(MD_ANCHOR_TABLE)
+    title = MD_ANCHOR_SPACE_PAT.sub("-", title)
+    return MD_ANCHOR_STRIP_PAT.sub("", title)
 
 
 def markdown_paragraph(block: str) -> List[str]:
@@ -69,21 +74,17 @@ def format_md_table_row(
 
 
 def format_md_table(rows: List[Dict], column_names: List[str]) -> List[str]:
-    max_widths: Dict[str, int] = {col: max(3, len(col)) for col in column_names}
-    for row in rows:
-        for col in column_names:
-            max_widths[col] = max(max_widths[col], len(row.get(col, "")))
-    lines = []
-    titles = []
-    for col in column_names:
-        titles.append(col.ljust(max_widths[col]))
-    lines.append("| " + " | ".join(titles) + " |\n")
-    seps = []
-    for col in column_names:
-        seps.append(max_widths[col] * "-")
-    lines.append("| " + " | ".join(seps) + " |\n")
-    for row in rows:
-        lines.append(format_md_table_row(row, column_names, max_widths))
+    cells = [[row.get(col, "") for col in column_names] for row in rows]
+    widths = [max(3, len(col)) for col in column_names]
+    if cells:
+        widths = [max(w, *map(len, col)) for w, col in zip(widths, zip(*cells))]
+    # Bake the column widths into a format string so each row is one format() call
+    format_row = ("| " + " | ".join(f"{{:<{w}}}" for w in widths) + " |\n").format
+    lines = [
+        format_row(*column_names),
+        format_row(*(w * "-" for w in widths)),
+    ]
+    lines.extend(format_row(*row) for row in cells)
     return lines
 
 
@@ -119,13 +120,12 @@ def params_to_rows(
 ) -> List[Dict]:
     rows = []
     for param in params:
-        ftype = param.type.replace("|", r"\|")
         # Replace vimdoc links |target|
         desc = VIMDOC_LINK_PAT.sub(r"\1", param.desc)
         rows.append(
             {
                 "Param": indent + param.name,
-                "Type": f"`{ftype}`",
+                "Type": f"`{param.escaped_type}`",
                 "Desc": desc,
             }
         )
@@ -150,36 +150,24 @@ def render_md_api2(funcs: List[LuaFunc], types: LuaTypes, level: int = 3) -> Lis
             continue
         args = ", ".join([param.name for param in func.params])
         signature = f"{func.name}({args})"
-        lines.append(level * "#" + f" {signature}\n")
+        title = level * "#" + f" {signature}\n"
         if func.returns:
             signature += ": " + ", ".join([r.type for r in func.returns])
-        lines.append("\n")
-        lines.append(f"`{signature}`")
         if func.summary:
-            lines.append(" \\\n")
-            lines.append(func.summary)
-            lines.append("\n\n")
+            lines.extend([title, "\n", f"`{signature}`", " \\\n", func.summary, "\n\n"])
         else:
-            lines.append("\n\n")
+            lines.extend([title, "\n", f"`{signature}`", "\n\n"])
         if func.params:
             rows = params_to_rows(func.params, types)
             cols = ["Param", "Type", "Desc"]
             lines.extend(format_md_table(rows, cols))
-        if any([r.desc for r in func.returns]):
+        if any(r.desc for r in func.returns):
             lines.extend(["\n", "Returns:\n", "\n"])
             rows = [{"Type": r.type, "Desc": r.desc} for r in func.returns]
             lines.extend(format_md_table(rows, ["Type", "Desc"]))
         if func.note:
-            lines.append("\n")
-            lines.append("**Note:**\n")
-            lines.append("<pre>\n")
-            lines.append(func.note)
-            lines.append("</pre>\n")
+            lines.extend(["\n", "**Note:**\n", "<pre>\n", func.note, "</pre>\n"])
         if func.example:
-            lines.append("\n")
-            lines.append("**Examples:**\n")
-            lines.append("```lua\n")
-            lines.append(func.example)
-            lines.append("```\n")
+            lines.extend(["\n", "**Examples:**\n", "```lua\n", func.example, "```\n"])
         lines.append("\n")
     return lines
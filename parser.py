@@ -1,7 +1,8 @@
+import os
 import re
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, List, Optional, Type
+from typing import Callable, Dict, List, Optional, Tuple, Type
 
 from pyparsing import (
     Combine,
@@ -191,6 +192,11 @@ class LuaFunc:
     def parse_annotation(cls, name: str, lines: List[str]) -> "LuaFunc":
         # Strip off the leading comment
         lines = [line[3:] for line in lines]
+        if not FORCE_PYPARSING:
+            try:
+                return _scan_annotation(cls(name), lines)
+            except _ScanError:
+                pass
         p = annotation.parseString("".join(lines), parseAll=True)
         params = []
         returns = []
@@ -217,6 +223,11 @@ class LuaParam:
     type: str
     desc: str = ""
     subparams: List["LuaParam"] = field(default_factory=list)
+    # The type with the | escaped, for use inside of markdown tables
+    escaped_type: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.escaped_type = self.type.replace("|", r"\|")
 
     @classmethod
     def from_parser(cls, p):
@@ -272,6 +283,152 @@ class LuaReturn:
         return cls(name, "".join(desc))
 
 
+# Set NVIM_DOC_TOOLS_PYPARSING=1 to always parse function annotations with the full
+# pyparsing grammar instead of the line scanner below
+FORCE_PYPARSING = os.environ.get("NVIM_DOC_TOOLS_PYPARSING", "0") != "0"
+
+_KW_END = r"(?![A-Za-z0-9_$])"
+_LUA_ATOM = (
+    rf"(?:(?:string|integer|number|any|boolean|table)\[\]{_KW_END}"
+    rf"|(?:nil|string|integer|boolean|number|table){_KW_END}"
+    r'|"[^"\\\n\r]*"'
+    r"|[0-9]+"
+    rf"|any{_KW_END}"
+    r"|\w+\.\w+(?:\[\])?)"
+)
+# Unions of simple types. Anything more complex (fun(), table<>, {}) is left to the
+# pyparsing grammar.
+LUA_TYPE_RE = re.compile(rf"{_LUA_ATOM}(?:\|{_LUA_ATOM})*")
+SUMMARY_RE = re.compile(r"[^@ \t\n].+")
+PARAM_RE = re.compile(r"[ \t]*@param[ \t]+(\.\.\.|[A-Za-z][A-Za-z0-9_]*)(\?)?[ \t]*")
+SUBPARAM_RE = re.compile(r"[ \t]+([A-Za-z][A-Za-z0-9_]*)(\?)?[ \t]*")
+RETURN_RE = re.compile(r"[ \t]*@return[ \t]+")
+BLOCK_LINE_RE = re.compile(r"[ \t][ \t]*[^ \t\n].*")
+
+
+class _ScanError(Exception):
+    """The line scanner can't handle the input and the full grammar must be used"""
+
+
+def _strip_newline(line: str) -> str:
+    return line[:-1] if line.endswith("\n") else line
+
+
+def _scan_type(body: str, pos: int) -> Tuple[str, str]:
+    """Parse a type and the trailing description starting at pos"""
+    m = LUA_TYPE_RE.match(body, pos)
+    if not m:
+        raise _ScanError()
+    rest = body[m.end() :]
+    desc = rest.lstrip(" \t")
+    # The grammar allows whitespace inside of unions and before the "<" of a table
+    if rest and (rest == desc or desc[:1] in ("|", "<")):
+        raise _ScanError()
+    return m[0], desc
+
+
+def _scan_param(func: "LuaFunc", lines: List[str], i: int) -> int:
+    m = PARAM_RE.match(lines[i])
+    if not m:
+        raise _ScanError()
+    ptype, desc = _scan_type(_strip_newline(lines[i]), m.end())
+    param = LuaParam(m[1], "nil|" + ptype if m[2] else ptype, desc)
+    i += 1
+    while i < len(lines):
+        m = SUBPARAM_RE.match(lines[i])
+        if not m:
+            break
+        ptype, desc = _scan_type(_strip_newline(lines[i]), m.end())
+        param.subparams.append(LuaParam(m[1], "nil|" + ptype if m[2] else ptype, desc))
+        i += 1
+    func.params.append(param)
+    return i
+
+
+def _scan_return(func: "LuaFunc", lines: List[str], i: int) -> int:
+    m = RETURN_RE.match(lines[i])
+    if not m:
+        raise _ScanError()
+    rtype, desc = _scan_type(_strip_newline(lines[i]), m.end())
+    func.returns.append(LuaReturn(rtype, desc))
+    return i + 1
+
+
+def _scan_private(func: "LuaFunc", lines: List[str], i: int) -> int:
+    if lines[i].strip(" \t\n") != "@private":
+        raise _ScanError()
+    func.private = True
+    return i + 1
+
+
+def _scan_deprecated(func: "LuaFunc", lines: List[str], i: int) -> int:
+    if lines[i].strip(" \t\n") != "@deprecated":
+        raise _ScanError()
+    func.deprecated = True
+    return i + 1
+
+
+def _scan_block(lines: List[str], i: int) -> Tuple[str, int]:
+    """Collect the indented lines following a tag like @example or @note"""
+    block = []
+    i += 1
+    while i < len(lines) and BLOCK_LINE_RE.match(lines[i]):
+        block.append(lines[i][1:])
+        i += 1
+    if not block:
+        raise _ScanError()
+    return "".join(block), i
+
+
+def _scan_example(func: "LuaFunc", lines: List[str], i: int) -> int:
+    if func.example or lines[i].strip(" \t\n") != "@example":
+        raise _ScanError()
+    func.example, i = _scan_block(lines, i)
+    return i
+
+
+def _scan_note(func: "LuaFunc", lines: List[str], i: int) -> int:
+    if func.note or lines[i].strip(" \t\n") != "@note":
+        raise _ScanError()
+    func.note, i = _scan_block(lines, i)
+    return i
+
+
+_TAG_SCANNERS: Dict[str, Callable[["LuaFunc", List[str], int], int]] = {
+    "@param": _scan_param,
+    "@return": _scan_return,
+    "@private": _scan_private,
+    "@deprecated": _scan_deprecated,
+    "@example": _scan_example,
+    "@note": _scan_note,
+}
+
+
+def _scan_annotation(func: "LuaFunc", lines: List[str]) -> "LuaFunc":
+    """Fast path for LuaFunc.parse_annotation that handles the common cases"""
+    # pyparsing expands tabs before parsing, so we have to as well
+    lines = [line.expandtabs() if "\t" in line else line for line in lines]
+    i = 0
+    if lines and lines[0] == "\n":
+        # The summary pattern can match across a leading blank line
+        raise _ScanError()
+    if lines and SUMMARY_RE.fullmatch(_strip_newline(lines[0])):
+        func.summary = _strip_newline(lines[0])
+        i = 1
+    while i < len(lines):
+        words = lines[i].split(None, 1)
+        if not words:
+            # Blank lines are only allowed at the end
+            if any(not line.isspace() for line in lines[i:]):
+                raise _ScanError()
+            break
+        scanner = _TAG_SCANNERS.get(words[0])
+        if scanner is None:
+            raise _ScanError()
+        i = scanner(func, lines, i)
+    return func
+
+
 def combined_list(expr, delim=","):
     delimited_list_expr = expr + (delim + Opt(White()) + expr)[None, None]
     return Combine(delimited_list_expr, adjacent=False)
@@ -430,3 +587,10 @@ lua_class = (
     + Suppress(LineEnd())
     + OneOrMore(lua_field).set_results_name("fields")
 )
+
+lua_type.streamline()
+annotation.streamline()
+
+# Packrat caching makes the recursive type rules much cheaper to re-match
+if os.environ.get("NVIM_DOC_TOOLS_PACKRAT", "1") != "0":
+    ParserElement.enable_packrat(cache_size_limit=None)
@@ -167,3 +167,40 @@ def test_parse_class() -> None:
     assert obj.fields == [
         parser.LuaField(name="fld_simple", type="string"),
     ]
+
+
+def test_scan_annotation_matches_grammar() -> None:
+    from .. import parser
+
+    lines = """---This is a function
+---@param varstring string this is a string
+---@param varoptstring? string this is an optional string
+---@param varunion nil|string|user.Type
+---@param varstrunion "a"|"b"
+---@param ... any
+---@param varnesttable table
+---    prop1 string a nested table prop
+---    prop2? integer[]
+---@private
+---@deprecated
+---@return string
+---@return user.Type a user type
+---@example
+---  local foo = require("foo")
+---    foo.bar()
+---@note
+--- This is a note
+""".splitlines(
+        keepends=True
+    )
+    func = parser._scan_annotation(parser.LuaFunc("M.myfunc"), [l[3:] for l in lines])
+    parser.FORCE_PYPARSING = True
+    try:
+        expected = parser.LuaFunc.parse_annotation("M.myfunc", lines)
+    finally:
+        parser.FORCE_PYPARSING = False
+    assert func == expected
+    assert func.params[-1].subparams == [
+        parser.LuaParam("prop1", "string", "a nested table prop"),
+        parser.LuaParam("prop2", "nil|integer[]"),
+    ]
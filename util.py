@@ -1,10 +1,14 @@
 """Utility methods for generating docs"""
 
 import json
+import os
 import re
+import shutil
 import subprocess
+import tempfile
 import textwrap
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
 __all__ = [
@@ -20,6 +24,10 @@ __all__ = [
     "commands_from_json",
 ]
 
+BLANK_LINE_RE = re.compile(r"^\s*$")
+LEADING_SPACE_RE = re.compile(r"[ \t]+")
+INDENT_RE = re.compile(r"^\s+")
+
 
 def indent(lines: List[str], amount: int) -> List[str]:
     ret = []
@@ -27,12 +35,12 @@ def indent(lines: List[str], amount: int) -> List[str]:
         if not line.endswith("\n"):
             line += "\n"
         if amount >= 0:
-            if re.match(r"^\s*$", line):
+            if BLANK_LINE_RE.match(line):
                 ret.append(line)
             else:
                 ret.append(" " * amount + line)
         else:
-            space = re.match(r"[ \t]+", line)
+            space = LEADING_SPACE_RE.match(line)
             if space:
                 ret.append(line[min(abs(amount), space.span()[1]) :])
             else:
@@ -44,7 +52,7 @@ def dedent(lines: List[str], amount: Optional[int] = None) -> List[str]:
     if amount is None:
         amount = len(lines[0])
         for line in lines:
-            m = re.match(r"^\s+", line)
+            m = INDENT_RE.match(line)
             if not m:
                 return lines
             amount = min(amount, len(m[0]))
@@ -54,32 +62,40 @@ def dedent(lines: List[str], amount: Optional[int] = None) -> List[str]:
 def replace_section(
     file: str, start_pat: str, end_pat: Optional[str], lines: List[str]
 ) -> None:
-    prefix_lines: List[str] = []
-    postfix_lines: List[str] = []
-    file_lines = prefix_lines
     found_section = False
-    with open(file, "r", encoding="utf-8") as ifile:
-        inside_section = False
-        for line in ifile:
-            if inside_section:
-                if end_pat is not None and re.match(end_pat, line):
-                    inside_section = False
-                    file_lines = postfix_lines
-                    file_lines.append(line)
-            else:
-                if not found_section and re.match(start_pat, line):
-                    inside_section = True
-                    found_section = True
-                file_lines.append(line)
-    if end_pat is None:
-        inside_section = False
-
-    if inside_section or not found_section:
-        raise Exception(f"could not find file section {start_pat} in {file}")
-
-    all_lines = prefix_lines + lines + postfix_lines
-    with open(file, "w", encoding="utf-8") as ofile:
-        ofile.write("".join(all_lines))
+    start_re = re.compile(start_pat)
+    end_re = None if end_pat is None else re.compile(end_pat)
+    # Stream the result into a temp file next to the target instead of holding the
+    # whole file in memory, then swap it into place
+    target = os.path.realpath(file)
+    fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with open(file, "r", encoding="utf-8") as ifile, os.fdopen(
+            fd, "w", encoding="utf-8"
+        ) as ofile:
+            inside_section = False
+            for line in ifile:
+                if inside_section:
+                    if end_re is not None and end_re.match(line):
+                        inside_section = False
+                        ofile.write(line)
+                else:
+                    ofile.write(line)
+                    if not found_section and start_re.match(line):
+                        inside_section = True
+                        found_section = True
+                        ofile.writelines(lines)
+        if end_pat is None:
+            inside_section = False
+
+        if inside_section or not found_section:
+            raise Exception(f"could not find file section {start_pat} in {file}")
+
+        shutil.copymode(target, tmpfile)
+        os.replace(tmpfile, target)
+    except BaseException:
+        os.remove(tmpfile)
+        raise
 
 
 def read_section(
@@ -90,17 +106,19 @@ def read_section(
 ) -> List[str]:
     lines = []
     found_section = False
+    start_re = re.compile(start_pat)
+    end_re = re.compile(end_pat) if end_pat else None
     with open(filename, "r", encoding="utf-8") as ifile:
         inside_section = False
         for line in ifile:
             if inside_section:
-                if end_pat and re.match(end_pat, line):
+                if end_re and end_re.match(line):
                     inside_section = False
                     if inclusive[1]:
                         lines.append(line)
                     break
                 lines.append(line)
-            elif re.match(start_pat, line):
+            elif start_re.match(line):
                 found_section = True
                 inside_section = True
                 if inclusive[0]:
@@ -113,6 +131,18 @@ def read_section(
     return lines
 
 
+@lru_cache(maxsize=64)
+def _wrapper(
+    # pylint: disable=W0621
+    indent: int,
+    sub_indent: int,
+    width: int,
+) -> textwrap.TextWrapper:
+    return textwrap.TextWrapper(
+        initial_indent=indent * " ", subsequent_indent=sub_indent * " ", width=width
+    )
+
+
 def wrap(
     text: str,
     # pylint: disable=W0621
@@ -126,15 +156,7 @@ def wrap(
     break_at_start = indent >= width
     if break_at_start:
         indent = sub_indent
-    ret = [
-        line + line_end
-        for line in textwrap.wrap(
-            text,
-            initial_indent=indent * " ",
-            subsequent_indent=sub_indent * " ",
-            width=width,
-        )
-    ]
+    ret = [line + line_end for line in _wrapper(indent, sub_indent, width).wrap(text)]
     if break_at_start:
         ret.insert(0, line_end)
     return ret
@@ -1,4 +1,4 @@
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
 from .apidoc import LuaFunc, LuaParam, LuaReturn, LuaTypes
 from .markdown import MD_BOLD_PAT, MD_LINE_BREAK_PAT, MD_LINK_PAT
@@ -83,18 +83,15 @@ class Vimdoc:
         return header + toc.render() + body
 
 
-def count_special(base: str, char: str) -> int:
-    c = base.count(char)
-    return 2 * (c // 2)
-
-
 def vimlen(string: str) -> int:
-    return len(string) - sum([count_special(string, c) for c in "`|*"])
+    # Pairs of `, |, and * are concealed by vim
+    pairs = string.count("`") // 2 + string.count("|") // 2 + string.count("*") // 2
+    return len(string) - 2 * pairs
 
 
 def leftright(left: str, right: str, width: int = 80) -> str:
     spaces = max(1, width - vimlen(left) - vimlen(right))
-    return left + spaces * " " + right + "\n"
+    return f"{left}{spaces * ' '}{right}\n"
 
 
 def format_vimdoc_commands(commands: List[Command]) -> List[str]:
@@ -127,38 +124,33 @@ def convert_md_link(match):
 
 
 def convert_markdown_to_vimdoc(lines: List[str]) -> List[str]:
-    while lines[0] == "\n":
-        lines.pop(0)
-    while lines[-1] == "\n":
-        lines.pop()
-    i = 0
+    start = 0
+    end = len(lines)
+    while start < end and lines[start] == "\n":
+        start += 1
+    while end > start and lines[end - 1] == "\n":
+        end -= 1
+    out = []
     code_block = False
-    while i < len(lines):
-        line = lines[i]
+    for line in lines[start:end]:
         if line.startswith("```"):
             code_block = not code_block
             if code_block:
                 lang = line[3:].strip()
-                lines[i] = f">{lang}\n"
+                out.append(f">{lang}\n")
             else:
-                lines[i] = "<\n"
+                out.append("<\n")
+        elif code_block:
+            out.append(4 * " " + line)
         else:
-            if code_block:
-                lines[i] = 4 * " " + line
+            line = MD_LINK_PAT.sub(convert_md_link, line)
+            line = MD_BOLD_PAT.sub(lambda x: x[1], line)
+            line = MD_LINE_BREAK_PAT.sub("", line)
+            if len(line) > 80:
+                out.extend(wrap(line))
             else:
-                line = MD_LINK_PAT.sub(convert_md_link, line)
-                line = MD_BOLD_PAT.sub(lambda x: x[1], line)
-                line = MD_LINE_BREAK_PAT.sub("", line)
-
-                if len(line) > 80:
-                    new_lines = wrap(line)
-                    lines[i : i + 1] = new_lines
-                    i += len(new_lines)
-                    continue
-                else:
-                    lines[i] = line
-        i += 1
-    return lines
+                out.append(line)
+    return out
 
 
 def convert_md_section_to_vimdoc(
@@ -191,24 +183,33 @@ def format_vimdoc_returns(returns: List[LuaReturn], indent: int) -> List[str]:
     return lines
 
 
+def _max_param_width(params: List[LuaParam]) -> int:
+    # Ignore params longer than 16 chars. They are outliers and will ruin the formatting
+    return (
+        max((len(param.name) for param in params if len(param.name) <= 16), default=8)
+        + 1
+    )
+
+
 # pylint: disable=W0621
 def format_vimdoc_params(
     params: List[LuaParam], types: LuaTypes, indent: int
 ) -> List[str]:
-    lines = []
-    # Ignore params longer than 16 chars. They are outliers and will ruin the formatting
-    max_param = (
-        max([len(param.name) for param in params if len(param.name) <= 16] or [8]) + 1
-    )
-    for param in params:
-        prefix = (
-            indent * " "
-            + "{"
-            + f"{param.name}"
-            + "}".ljust(max_param - len(param.name))
-            + " "
-        )
-        line = prefix + f"`{param.type}`" + " "
+    lines: List[str] = []
+    # Each entry is (remaining params, indent, max param width, lines to add after)
+    stack: List[Tuple[Iterator[LuaParam], int, int, List[str]]] = [
+        (iter(params), indent, _max_param_width(params), [])
+    ]
+    while stack:
+        remaining, indent, max_param, trailer = stack[-1]
+        param = next(remaining, None)
+        if param is None:
+            stack.pop()
+            lines.extend(trailer)
+            continue
+        pad = " " * (max_param - len(param.name) - 1)
+        prefix = f"{' ' * indent}{{{param.name}}}{pad} "
+        line = f"{prefix}`{param.type}` "
         sub_indent = min(len(prefix), max_param + indent + 2)
         desc = wrap(param.desc, indent=len(line), sub_indent=sub_indent)
         if desc:
@@ -219,13 +220,19 @@ def format_vimdoc_params(
             lines.extend(desc)
         else:
             lines.append(line.rstrip() + "\n")
-        subparams = param.get_subparams(types)
-        if subparams:
-            lines.extend(format_vimdoc_params(subparams, types, indent + 4))
 
         alias_vals = param.get_enum_values(types)
-        if alias_vals:
-            lines.extend(format_vimdoc_alias_values(alias_vals, indent + 4))
+        alias_lines = (
+            format_vimdoc_alias_values(alias_vals, indent + 4) if alias_vals else []
+        )
+        subparams = param.get_subparams(types)
+        if subparams:
+            # The enum values go after all of the nested params
+            stack.append(
+                (iter(subparams), indent + 4, _max_param_width(subparams), alias_lines)
+            )
+        else:
+            lines.extend(alias_lines)
 
     return lines
 
@@ -234,7 +241,7 @@ def format_vimdoc_alias_values(params: List[AliasValue], indent: int) -> List[st
     lines = []
     # Ignore values longer than 12 chars. They are outliers and will ruin the formatting
     max_param = (
-        max([len(val.value) for val in params if len(val.value) <= 12] or [8]) + 1
+        max((len(val.value) for val in params if len(val.value) <= 12), default=8) + 1
     )
     for val in params:
         line = indent * " " + f"`{val.value}`" + "".ljust(max_param - len(val.value))
@@ -272,17 +279,15 @@ def render_vimdoc_api2(
             lines.append(4 * " " + "Parameters:\n")
             lines.extend(format_vimdoc_params(func.params, types, 6))
 
-        if any([r.desc for r in func.returns]):
+        if any(r.desc for r in func.returns):
             lines.append(4 * " " + "Returns:\n")
             lines.extend(format_vimdoc_returns(func.returns, 6))
 
         if func.note:
-            lines.append("\n")
-            lines.append(4 * " " + "Note:\n")
+            lines.extend(["\n", "    Note:\n"])
             lines.extend(indent(func.note.splitlines(), 6))
         if func.example:
-            lines.append("\n")
-            lines.append(4 * " " + "Examples: >lua\n")
+            lines.extend(["\n", "    Examples: >lua\n"])
             lines.extend(indent(func.example.splitlines(), 6))
             lines.append("<\n")
         lines.append("\n")